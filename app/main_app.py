@@ -1,14 +1,24 @@
 import sys
 import os
+import logging
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTextEdit, QLabel, QPushButton, QComboBox, QSplitter, QSizePolicy
+    QTextEdit, QLabel, QPushButton, QComboBox, QSplitter, QSizePolicy, QCheckBox
 )
-from PySide6.QtGui import QPixmap, QScreen, QGuiApplication
-from PySide6.QtCore import Qt, QSettings, QThread, Signal, QTimer, QEventLoop, QPoint
+from PySide6.QtGui import QPixmap, QScreen, QGuiApplication, QCursor, QImage
+from PySide6.QtCore import Qt, QSettings, QTimer
+import numpy as np
 
-# Assuming ocr_utils.py is in the same directory (app/)
+try:
+    import mss # Fast native screen capture; optional, Qt's grab is used without it
+except ImportError:
+    mss = None
+
+# Assuming ocr_utils.py and ocr_pipeline.py are in the same directory (app/)
 from ocr_utils import OCRProcessor
+from ocr_pipeline import PipelineController, ScreenRequest
+
+log = logging.getLogger(__name__)
 
 # Define a path for screenshots relative to the app directory
 SCREENSHOT_TEMP_DIR = os.path.join(os.path.dirname(__file__), "temp_screenshots")
@@ -26,34 +36,11 @@ AVAILABLE_LANGUAGES = {
     # Add more languages as needed and ensure PaddleOCR supports them
 }
 DEFAULT_LANGUAGE = "English" # Display name
-
-class OCRWorker(QThread):
-    """
-    Worker thread for performing OCR to avoid freezing the GUI.
-    """
-    ocr_finished = Signal(str) # Signal emitting the extracted text or error message
-    
-    def __init__(self, ocr_processor: OCRProcessor, image_path: str):
-        super().__init__()
-        self.ocr_processor = ocr_processor
-        self.image_path = image_path
-
-    def run(self):
-        try:
-            if not self.image_path or not os.path.exists(self.image_path):
-                self.ocr_finished.emit("Error: Screenshot path is invalid or file does not exist for OCR.")
-                return
-
-            extracted_text = self.ocr_processor.process_image(self.image_path)
-            if extracted_text:
-                self.ocr_finished.emit(extracted_text)
-            else:
-                # The process_image method in ocr_utils now prints its own detailed error/no-text messages.
-                # We can provide a generic one here or rely on those logs.
-                self.ocr_finished.emit("No text could be extracted or an error occurred during OCR. Check console for details.")
-        except Exception as e:
-            self.ocr_finished.emit(f"Critical error in OCR thread: {e}")
-
+CODE_TO_DISPLAY = {code: name for name, code in AVAILABLE_LANGUAGES.items()} # Reverse lookup
+CONTINUOUS_SCAN_INTERVAL_MS = 5000 # Delay between scans when continuous scanning is on
+# Hiding the window is asynchronous, so the grab polls until the window is no longer exposed
+CAPTURE_FRAME_MS = 16 # Re-check interval while the window is still on screen (~1 frame)
+CAPTURE_MAX_EXPOSED_CHECKS = 30 # Give up waiting after ~0.5 s of re-checks and grab anyway
 
 class ScreenshotApp(QMainWindow):
     def __init__(self):
@@ -63,12 +50,32 @@ class ScreenshotApp(QMainWindow):
 
         self.settings = QSettings("MyCompany", "ScreenshotTextExtractor") # For saving/loading settings
         
-        self.ocr_processor = OCRProcessor(lang=AVAILABLE_LANGUAGES[DEFAULT_LANGUAGE])
+        # Start with the last used language so only that model is loaded at startup
+        lang_display_name = self.settings.value("language", DEFAULT_LANGUAGE)
+        lang_code = AVAILABLE_LANGUAGES.get(lang_display_name, AVAILABLE_LANGUAGES[DEFAULT_LANGUAGE])
+        self.ocr_processor = OCRProcessor(lang=lang_code)
         self.current_screenshot_path: str | None = None
-        self.ocr_worker_thread: OCRWorker | None = None # For managing the OCR worker thread
+        self._last_saved_path: str | None = None # last_screenshot_path as currently stored in settings
+        self.capture_in_progress = False # True while the window is hidden for a grab
+        self._hid_for_capture = False # Whether the current grab hid the window and must show it again
+        self._exposed_checks = 0
+        # One mss handle reused for every capture; it must stay on the GUI thread that created it
+        self._sct = self._create_mss()
+
+        # Captured screens go through the preprocess -> OCR pipeline off the GUI thread
+        self.pipeline = PipelineController(self.ocr_processor, self)
+        self.pipeline.ocr_finished.connect(self.on_ocr_completed)
+        self.pipeline.finished.connect(self.on_ocr_task_finished)
+        self.pipeline.screenshot_saved.connect(self.on_screenshot_saved)
+
+        # Re-submits a scan every few seconds while continuous scanning is on
+        self.continuous_timer = QTimer(self)
+        self.continuous_timer.setInterval(CONTINUOUS_SCAN_INTERVAL_MS)
+        self.continuous_timer.timeout.connect(self.on_continuous_tick)
 
         self.init_ui()
         self.load_settings()
+        self.start_ocr_warmup()
 
     def init_ui(self):
         # Main widget and layout
@@ -99,14 +106,9 @@ class ScreenshotApp(QMainWindow):
         language_layout = QHBoxLayout()
         language_label = QLabel("OCR Language:")
         self.language_combo = QComboBox()
-        for lang_name in AVAILABLE_LANGUAGES.keys():
-            self.language_combo.addItem(lang_name)
-        
-        current_lang_display = self.settings.value("language", DEFAULT_LANGUAGE)
-        if current_lang_display in AVAILABLE_LANGUAGES:
-            self.language_combo.setCurrentText(current_lang_display)
-        else:
-            self.language_combo.setCurrentText(DEFAULT_LANGUAGE)
+        self.language_combo.addItems(list(AVAILABLE_LANGUAGES))
+        # ocr_processor was created with the saved language (or the default if it is no longer valid)
+        self.language_combo.setCurrentText(CODE_TO_DISPLAY[self.ocr_processor.current_lang])
             
         self.language_combo.currentTextChanged.connect(self.on_language_change)
         language_layout.addWidget(language_label)
@@ -116,6 +118,10 @@ class ScreenshotApp(QMainWindow):
         self.scan_button = QPushButton("Scan Screen")
         self.scan_button.clicked.connect(self.scan_screen_and_process)
         right_panel_layout.addWidget(self.scan_button)
+
+        self.continuous_checkbox = QCheckBox("Continuous scan")
+        self.continuous_checkbox.toggled.connect(self.on_continuous_toggled)
+        right_panel_layout.addWidget(self.continuous_checkbox)
         
         right_panel_widget.setLayout(right_panel_layout)
         splitter.addWidget(right_panel_widget)
@@ -126,124 +132,198 @@ class ScreenshotApp(QMainWindow):
         main_layout.addWidget(splitter)
         central_widget.setLayout(main_layout)
 
+    def start_ocr_warmup(self):
+        self.pipeline.warm_up()
+
+    def on_continuous_toggled(self, checked: bool):
+        if checked:
+            self.continuous_timer.start()
+            self.on_continuous_tick() # First scan right away, if the pipeline has room
+        else:
+            self.continuous_timer.stop()
+
+    def on_continuous_tick(self):
+        # Skip this tick rather than capture a screen the pipeline would drop
+        if not self.capture_in_progress and not self.pipeline.is_full():
+            self.scan_screen_and_process()
+
+    def _show_status(self, message: str):
+        """Reports capture progress without overwriting the last OCR result during continuous scans."""
+        if self.continuous_checkbox.isChecked():
+            self.statusBar().showMessage(message, CONTINUOUS_SCAN_INTERVAL_MS)
+        else:
+            self.text_area.setText(message)
+
     def on_language_change(self, lang_display_name: str):
         lang_code = AVAILABLE_LANGUAGES.get(lang_display_name)
         if lang_code:
             self.ocr_processor.set_language(lang_code)
             self.settings.setValue("language", lang_display_name)
-            print(f"Language set to: {lang_display_name} ({lang_code})")
+            log.debug("Language set to: %s (%s)", lang_display_name, lang_code)
         else:
-            print(f"Warning: Language '{lang_display_name}' not found in available languages.")
+            log.warning("Language '%s' not found in available languages.", lang_display_name)
 
-    def take_screenshot(self) -> str | None:
-        """Takes a screenshot of the primary screen and saves it."""
-        screen = QGuiApplication.primaryScreen()
+    def _create_mss(self):
+        """Returns an mss handle, or None when Qt's screen grab should be used instead."""
+        if mss is None:
+            return None
+        if QGuiApplication.platformName().startswith("wayland"):
+            # Under XWayland mss "succeeds" but returns black or X11-only frames
+            log.debug("Wayland session, using Qt screen grab instead of mss.")
+            return None
+        try:
+            return mss.mss()
+        except Exception as e: # e.g. ScreenShotError when $DISPLAY is unset or X libraries are missing
+            log.warning("mss unavailable (%s), using Qt screen grab.", e)
+            return None
+
+    def take_screenshot(self, screen: QScreen | None = None) -> np.ndarray | QImage | None:
+        """
+        Grabs the given screen (the primary one by default). Returns a BGRA HxWx4 array from mss,
+        or the QImage from Qt's grab, which the pipeline converts without an extra copy.
+        Uses mss when available and falls back to Qt's grab when mss is missing, fails, or on Wayland.
+        """
+        if screen is None:
+            screen = QGuiApplication.primaryScreen()
         if not screen:
             self.text_area.setText("Error: Could not get primary screen.")
             return None
-        
-        original_pos = self.pos()
-        # Define a fixed large off-screen position
-        off_screen_pos = QPoint(-10000, -10000)
-        
-        try:
-            self.move(off_screen_pos)
-            QApplication.processEvents() # Ensure move is processed
 
-            # Minimal delay for the move to register
-            move_delay_loop = QEventLoop()
-            QTimer.singleShot(20, move_delay_loop.quit) # Reduced delay to 20 ms
-            move_delay_loop.exec()
-            
-            pixmap = screen.grabWindow(0) # Grab the entire screen
-            self.current_screenshot_path = DEFAULT_SCREENSHOT_PATH
-            
-            if not pixmap.save(self.current_screenshot_path, "png"):
-                self.text_area.setText(f"Error: Failed to save screenshot to {self.current_screenshot_path}")
-                self.current_screenshot_path = None
-            else:
-                print(f"Screenshot saved to {self.current_screenshot_path}")
+        if self._sct is not None:
+            try:
+                # mss frames are BGRA already; np.asarray wraps the captured buffer without copying
+                return np.asarray(self._sct.grab(self._mss_monitor_for(screen)))
+            except Exception as e:
+                log.warning("mss capture failed (%s), falling back to Qt screen grab.", e)
         
+        try:
+            # Grab the whole screen; with window 0 the offset is relative to this screen
+            geometry = screen.geometry()
+            pixmap = screen.grabWindow(0, 0, 0, geometry.width(), geometry.height())
         except Exception as e:
             self.text_area.setText(f"Error taking screenshot: {e}")
-            self.current_screenshot_path = None
-        finally:
-            # Ensure window is always moved back
-            self.move(original_pos)
-            QApplication.processEvents() # Ensure window is redrawn at original position
-            
-            # Minimal delay for the window to resettle visually
-            settle_loop = QEventLoop()
-            QTimer.singleShot(20, settle_loop.quit) # Reduced delay to 20ms
-            settle_loop.exec()
+            return None
             
-        return self.current_screenshot_path
-
-    def display_screenshot_thumbnail(self, image_path: str):
-        if not os.path.exists(image_path):
-            self.screenshot_label.setText("Screenshot file not found.")
-            return
-
-        pixmap = QPixmap(image_path)
-        if pixmap.isNull():
+        return None if pixmap.isNull() else pixmap.toImage()
+
+    def _mss_monitor_for(self, screen: QScreen) -> dict:
+        """Finds the mss monitor matching a QScreen, defaulting to the primary monitor."""
+        geometry = screen.geometry()
+        ratio = screen.devicePixelRatio()
+        # Qt reports logical coordinates, mss physical ones; depending on the platform
+        # the screen origin is given either unscaled or scaled by the device pixel ratio
+        origins = {(geometry.x(), geometry.y()), (round(geometry.x() * ratio), round(geometry.y() * ratio))}
+        for monitor in self._sct.monitors[1:]: # monitors[0] is the union of all screens
+            if (monitor["left"], monitor["top"]) in origins:
+                return monitor
+        return self._sct.monitors[1]
+
+    def display_screenshot_thumbnail(self, image: QImage):
+        if image.isNull():
             self.screenshot_label.setText("Failed to load screenshot.")
             return
         
-        # Scale pixmap to fit the label while maintaining aspect ratio
-        scaled_pixmap = pixmap.scaled(
-            self.screenshot_label.size(), 
+        # Scale image to fit the label while maintaining aspect ratio.
+        # A fast (nearest) pass to twice the target size does the bulk of the shrinking,
+        # then a smooth pass over the much smaller image keeps the thumbnail clean.
+        target_size = self.screenshot_label.size()
+        if image.width() > target_size.width() * 2 or image.height() > target_size.height() * 2:
+            image = image.scaled(
+                target_size * 2,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.FastTransformation
+            )
+        scaled_image = image.scaled(
+            target_size, 
             Qt.AspectRatioMode.KeepAspectRatio, 
             Qt.TransformationMode.SmoothTransformation
         )
-        self.screenshot_label.setPixmap(scaled_pixmap)
+        self.screenshot_label.setPixmap(QPixmap.fromImage(scaled_image))
 
     def scan_screen_and_process(self):
+        if self.capture_in_progress:
+            return
+        self.capture_in_progress = True
         self.scan_button.setEnabled(False)
-        self.text_area.setText("Taking screenshot...")
+        self._show_status("Taking screenshot...")
         QApplication.processEvents() # Ensure UI update is processed
+        self._begin_capture()
+
+    # The capture runs as a chain of event and timer callbacks instead of nested event loops,
+    # so the GUI thread never blocks while the window is out of the way.
+    def _begin_capture(self):
+        """Hides the window (no minimize animation) and polls until it is off screen to grab."""
+        # Capture the display the user is working on, not always the primary one
+        self._capture_screen = QGuiApplication.screenAt(QCursor.pos()) or QGuiApplication.primaryScreen()
+        self._exposed_checks = 0
+        # A minimized window is already out of the way; grab directly and leave its state alone
+        self._hid_for_capture = not self.isMinimized()
+        if self._hid_for_capture:
+            self.hide()
+        QTimer.singleShot(0, self._do_grab)
+
+    def _do_grab(self):
+        """Grabs the screen once the window is hidden, shows it again and hands the image on to OCR."""
+        window = self.windowHandle()
+        if window is not None and window.isExposed() and self._exposed_checks < CAPTURE_MAX_EXPOSED_CHECKS:
+            # Still on screen; grabbing now would OCR our own window, so check again next frame
+            self._exposed_checks += 1
+            QTimer.singleShot(CAPTURE_FRAME_MS, self._do_grab)
+            return
 
-        # Add a brief delay to allow UI to settle before window manipulation
-        # This might help make the transition smoother on some systems.
-        pre_capture_delay_loop = QEventLoop()
-        QTimer.singleShot(50, pre_capture_delay_loop.quit) # 50ms delay
-        pre_capture_delay_loop.exec()
-
-        screenshot_file = self.take_screenshot()
-
-        if screenshot_file and os.path.exists(screenshot_file):
-            self.display_screenshot_thumbnail(screenshot_file)
-            self.text_area.setText(f"Screenshot taken: {os.path.basename(screenshot_file)}\nStarting OCR...")
-            QApplication.processEvents()
-
-            # Run OCR in a separate thread
-            if self.ocr_worker_thread and self.ocr_worker_thread.isRunning():
-                # Should not happen if button is disabled, but as a safeguard
-                print("OCR is already in progress.")
-                self.scan_button.setEnabled(True) # Re-enable if somehow stuck
+        try:
+            screenshot_frame = self.take_screenshot(self._capture_screen)
+        finally:
+            # Ensure a window hidden for the grab is always shown again
+            if self._hid_for_capture:
+                self.show()
+                self._hid_for_capture = False
+        QTimer.singleShot(0, lambda: self._after_grab(screenshot_frame))
+
+    def _after_grab(self, screenshot_frame: np.ndarray | QImage | None):
+        """Shows the thumbnail and submits the captured frame to the OCR pipeline."""
+        self.capture_in_progress = False
+        if screenshot_frame is not None:
+            # The thumbnail comes from memory; the PNG is written by the pipeline's preprocess stage.
+            if isinstance(screenshot_frame, QImage):
+                self.display_screenshot_thumbnail(screenshot_frame)
+            else:
+                # BGRA bytes are Qt's RGB32 layout, so the frame can be wrapped without a copy
+                height, width = screenshot_frame.shape[:2]
+                self.display_screenshot_thumbnail(QImage(
+                    screenshot_frame.data, width, height, screenshot_frame.strides[0], QImage.Format.Format_RGB32
+                ))
+            screenshot_file = DEFAULT_SCREENSHOT_PATH
+
+            # Run OCR off the GUI thread
+            if not self.pipeline.submit(ScreenRequest(screenshot_frame, screenshot_file)):
+                # Should not happen as scans are only started with room in the pipeline, but as a safeguard.
+                # OCR is still running, so the button stays disabled until on_ocr_task_finished.
+                log.warning("OCR pipeline is full, screenshot dropped.")
+                self._show_status("OCR is still busy with earlier screenshots; this one was skipped.")
                 return
 
-            self.ocr_worker_thread = OCRWorker(self.ocr_processor, screenshot_file)
-            self.ocr_worker_thread.ocr_finished.connect(self.on_ocr_completed)
-            self.ocr_worker_thread.finished.connect(self.on_ocr_thread_finished) # Clean up
-            self.ocr_worker_thread.start()
-            
-            # Optionally, save the last used image path for display on next launch
-            self.settings.setValue("last_screenshot_path", screenshot_file)
+            self._show_status("Screenshot taken. Starting OCR...")
         else:
-            self.text_area.setText("Failed to take or save screenshot. OCR aborted.")
+            self._show_status("Failed to take screenshot. OCR aborted.")
             self.screenshot_label.setText("Screenshot failed.")
             self.scan_button.setEnabled(True)
 
+    def on_screenshot_saved(self, path: str):
+        # Only a PNG that was actually written is worth showing again on the next launch
+        self.current_screenshot_path = path
+        if path != self._last_saved_path:
+            self.settings.setValue("last_screenshot_path", path)
+            self._last_saved_path = path
+
     def on_ocr_completed(self, text_or_error: str):
         self.text_area.setText(text_or_error)
-        # scan_button is re-enabled in on_ocr_thread_finished
+        # scan_button is re-enabled in on_ocr_task_finished
 
-    def on_ocr_thread_finished(self):
-        self.scan_button.setEnabled(True)
-        if self.ocr_worker_thread: # Ensure it exists before trying to delete
-            self.ocr_worker_thread.deleteLater() # Schedule for deletion
-            self.ocr_worker_thread = None
-        print("OCR thread finished.")
+    def on_ocr_task_finished(self):
+        if not self.capture_in_progress:
+            self.scan_button.setEnabled(True)
+        log.debug("OCR task finished.")
 
     def load_settings(self):
         # Load window geometry
@@ -251,22 +331,12 @@ class ScreenshotApp(QMainWindow):
         if geometry:
             self.restoreGeometry(geometry)
         
-        # Load language
-        lang_display_name = self.settings.value("language", DEFAULT_LANGUAGE)
-        if lang_display_name in AVAILABLE_LANGUAGES:
-            self.language_combo.setCurrentText(lang_display_name)
-            # ocr_processor is initialized with default, so update if different
-            if lang_display_name != DEFAULT_LANGUAGE:
-                 self.ocr_processor.set_language(AVAILABLE_LANGUAGES[lang_display_name])
-        else: # Fallback if saved language is no longer valid
-            self.language_combo.setCurrentText(DEFAULT_LANGUAGE)
-            self.ocr_processor.set_language(AVAILABLE_LANGUAGES[DEFAULT_LANGUAGE])
-
         # Load last screenshot for display (if any)
         last_screenshot = self.settings.value("last_screenshot_path")
+        self._last_saved_path = last_screenshot
         if last_screenshot and os.path.exists(last_screenshot):
             self.current_screenshot_path = last_screenshot
-            self.display_screenshot_thumbnail(last_screenshot)
+            self.display_screenshot_thumbnail(QImage(last_screenshot))
         else:
             # If no last screenshot or path is invalid, clear the label
             self.screenshot_label.setText("Take a new screenshot.")
@@ -277,15 +347,22 @@ class ScreenshotApp(QMainWindow):
         # Save settings before closing
         self.settings.setValue("geometry", self.saveGeometry())
         self.settings.setValue("language", self.language_combo.currentText())
-        if self.current_screenshot_path and os.path.exists(self.current_screenshot_path):
-             self.settings.setValue("last_screenshot_path", self.current_screenshot_path)
-        else:
-            # If no valid current screenshot, remove the setting or set to empty
-            self.settings.remove("last_screenshot_path")
+        # current_screenshot_path is only set for files validated at load or written by a scan
+        if self.current_screenshot_path != self._last_saved_path:
+            if self.current_screenshot_path:
+                self.settings.setValue("last_screenshot_path", self.current_screenshot_path)
+            else:
+                # If no valid current screenshot, remove the setting or set to empty
+                self.settings.remove("last_screenshot_path")
+
+        if self._sct is not None:
+            self._sct.close()
             
         super().closeEvent(event)
 
 if __name__ == '__main__':
+    # Debug messages are dropped before their arguments are even formatted
+    logging.basicConfig(level=logging.WARNING)
     app = QApplication(sys.argv)
     main_win = ScreenshotApp()
     main_win.show()
@@ -0,0 +1,197 @@
+import logging
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from PySide6.QtGui import QImage
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+# Assuming ocr_utils.py is in the same directory (app/)
+from ocr_utils import OCRProcessor
+
+log = logging.getLogger(__name__)
+
+MAX_PENDING_REQUESTS = 2 # Screens allowed in the pipeline at once; further submits are dropped
+
+def qimage_to_bgr_array(image: QImage, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Converts a QImage into a BGR uint8 HxWx3 array, the layout PaddleOCR expects.
+    The result is written into out when it has the right shape, otherwise a new array is allocated.
+    """
+    # Screen grabs are already RGB32, so this is normally a no-op rather than a copy.
+    # RGB32 pixels are 0xffRRGGBB words, i.e. B, G, R, 0xff bytes on little-endian machines.
+    image = image.convertToFormat(QImage.Format.Format_RGB32)
+    # Wrap the pixel buffer without copying; 32-bit scanlines have no padding.
+    # image stays alive until the conversion below is done with the view.
+    bgra = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(image.height(), image.width(), 4)
+    return bgra_to_bgr_array(bgra, out)
+
+def bgra_to_bgr_array(frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Converts a BGRA HxWx4 frame into a BGR uint8 HxWx3 array, the layout PaddleOCR expects.
+    The result is written into out when it has the right shape, otherwise a new array is allocated.
+    """
+    height, width = frame.shape[:2]
+    if out is None or out.shape != (height, width, 3):
+        out = np.empty((height, width, 3), dtype=np.uint8)
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=out)
+
+def save_screenshot(image: np.ndarray, path: str) -> bool:
+    """Writes the screenshot as PNG with fast compression; only needed for the next launch. Returns True on success."""
+    # zlib level 1: much faster than the default, slightly larger file
+    try:
+        saved = cv2.imwrite(path, image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    except cv2.error as e:
+        log.error("Failed to save screenshot to %s: %s", path, e)
+        return False
+    if saved:
+        log.debug("Screenshot saved to %s", path)
+    else:
+        log.error("Failed to save screenshot to %s", path)
+    return saved
+
+
+@dataclass
+class ScreenRequest:
+    """A captured screen on its way through the pipeline."""
+    # BGRA uint8 HxWx4 capture from mss, or the QImage from Qt's grab; both are safe off the GUI thread
+    frame: np.ndarray | QImage
+    save_path: str | None = None # Where to keep a PNG copy, if anywhere
+
+
+class PreprocessRunnable(QRunnable):
+    """
+    Thread pool task that converts a captured screen into an OCR-ready array, then saves it to disk.
+    """
+    class Signals(QObject):
+        preprocessed = Signal(object) # BGR numpy array, or None if the conversion failed
+        saved = Signal(str) # Path of the PNG copy, emitted only once it has been written
+
+    def __init__(self, request: ScreenRequest, buffers: list, slot: int):
+        super().__init__()
+        self.signals = PreprocessRunnable.Signals()
+        self.request = request
+        # Output array reused across scans; this task owns buffers[slot] until its OCR is done
+        self.buffers = buffers
+        self.slot = slot
+
+    def run(self):
+        try:
+            frame = self.request.frame
+            if isinstance(frame, QImage):
+                image = qimage_to_bgr_array(frame, self.buffers[self.slot])
+            else:
+                image = bgra_to_bgr_array(frame, self.buffers[self.slot])
+            self.buffers[self.slot] = image
+        except Exception as e:
+            log.error("Error preparing screenshot for OCR: %s", e)
+            image = None
+        self.signals.preprocessed.emit(image)
+
+        # Saved after the hand-off, so the PNG encode overlaps with OCR (which only reads the array)
+        if image is not None and self.request.save_path:
+            if save_screenshot(image, self.request.save_path):
+                self.signals.saved.emit(self.request.save_path)
+
+
+class OCRRunnable(QRunnable):
+    """
+    Thread pool task for performing OCR to avoid freezing the GUI.
+    """
+    class Signals(QObject):
+        # QRunnable is not a QObject, so its signals live on a helper object
+        ocr_finished = Signal(str) # Signal emitting the extracted text or error message
+        finished = Signal() # Emitted once the task is fully done
+
+    def __init__(self, ocr_processor: OCRProcessor, image: np.ndarray | None):
+        super().__init__()
+        self.signals = OCRRunnable.Signals()
+        self.ocr_processor = ocr_processor
+        self.image = image
+
+    def run(self):
+        try:
+            if self.image is None or self.image.size == 0:
+                self.signals.ocr_finished.emit("Error: Screenshot image is empty, nothing to run OCR on.")
+                return
+
+            extracted_text = self.ocr_processor.process_image(self.image)
+            if extracted_text:
+                self.signals.ocr_finished.emit(extracted_text)
+            else:
+                # The process_image method in ocr_utils now prints its own detailed error/no-text messages.
+                # We can provide a generic one here or rely on those logs.
+                self.signals.ocr_finished.emit("No text could be extracted or an error occurred during OCR. Check console for details.")
+        except Exception as e:
+            self.signals.ocr_finished.emit(f"Critical error in OCR thread: {e}")
+        finally:
+            self.signals.finished.emit()
+
+
+class OCRWarmupRunnable(QRunnable):
+    """
+    Thread pool task that warms up the OCR pipeline at startup without blocking the GUI.
+    """
+    def __init__(self, ocr_processor: OCRProcessor):
+        super().__init__()
+        self.ocr_processor = ocr_processor
+
+    def run(self):
+        try:
+            self.ocr_processor.warm_up()
+        except Exception as e:
+            log.warning("OCR warm-up failed: %s", e)
+
+
+class PipelineController(QObject):
+    """
+    Runs captured screens through the preprocess and OCR stages.
+    Capture happens on the GUI thread; each later stage has its own single-thread pool,
+    so preparing and saving one screen overlaps with OCR of the previous one.
+    """
+    ocr_finished = Signal(str) # Extracted text or error message for a request
+    finished = Signal() # A request has left the pipeline
+    screenshot_saved = Signal(str) # A request's PNG copy has been written to this path
+
+    def __init__(self, ocr_processor: OCRProcessor, parent: QObject | None = None):
+        super().__init__(parent)
+        self.ocr_processor = ocr_processor
+        self.pending = 0 # Requests submitted but not yet through OCR; only touched on the GUI thread
+        # One BGR output array per in-flight request, allocated on first use and reused after that.
+        # Requests take slots in turn, and a slot only comes round again once its OCR has finished.
+        self._bgr_buffers: list[np.ndarray | None] = [None] * MAX_PENDING_REQUESTS
+        self._next_slot = 0
+
+        self.preprocess_pool = QThreadPool(self)
+        self.preprocess_pool.setMaxThreadCount(1)
+        # PaddleOCR is not thread-safe, so all OCR work runs on a single pooled thread
+        self.ocr_pool = QThreadPool.globalInstance()
+        self.ocr_pool.setMaxThreadCount(1)
+
+    def is_full(self) -> bool:
+        return self.pending >= MAX_PENDING_REQUESTS
+
+    def warm_up(self):
+        # The OCR pool runs tasks in order, so a scan submitted early waits for the warm-up
+        self.ocr_pool.start(OCRWarmupRunnable(self.ocr_processor))
+
+    def submit(self, request: ScreenRequest) -> bool:
+        """Queues a captured screen for OCR. Returns False if the pipeline is full."""
+        if self.is_full():
+            return False
+        self.pending += 1
+        task = PreprocessRunnable(request, self._bgr_buffers, self._next_slot)
+        self._next_slot = (self._next_slot + 1) % MAX_PENDING_REQUESTS
+        task.signals.preprocessed.connect(self._on_preprocessed)
+        task.signals.saved.connect(self.screenshot_saved)
+        self.preprocess_pool.start(task)
+        return True
+
+    def _on_preprocessed(self, image: np.ndarray | None):
+        task = OCRRunnable(self.ocr_processor, image)
+        task.signals.ocr_finished.connect(self.ocr_finished)
+        task.signals.finished.connect(self._on_ocr_task_finished)
+        self.ocr_pool.start(task)
+
+    def _on_ocr_task_finished(self):
+        self.pending -= 1
+        self.finished.emit()
@@ -1,121 +1,168 @@
 import os
+import logging
+from collections import OrderedDict
 # import sys # No longer needed for _MEIPASS logic here
+
+# Paddle reads its FLAGS_* from the environment when it is imported, so these must be set first.
+# Let cuDNN search for the fastest conv algorithms (ignored on CPU builds).
+os.environ.setdefault("FLAGS_cudnn_exhaustive_search", "1")
+os.environ.setdefault("FLAGS_conv_workspace_size_limit", "4096")
+
+# Keep downloaded models in a known, persistent folder next to the app instead of ~/.paddlex.
+# PaddleX only downloads a model when its folder is missing, so later loads read straight from here.
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "paddle_models")
+os.environ.setdefault("PADDLE_PDX_CACHE_HOME", MODEL_DIR)
+# Newer PaddleX versions probe the model hosting sites on start-up; the models are cached locally
+os.environ.setdefault("PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK", "True")
+
 from paddleocr import PaddleOCR
-from typing import List, Optional
+from typing import Optional, Union
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
 
 class OCRProcessor:
     """
     Handles OCR processing using PaddleOCR.
     """
-    def __init__(self, lang: str = 'en'):
+    _use_gpu: Optional[bool] = None # Device probe result, shared by all instances
+    _hpi_available: Optional[bool] = None # Whether high-performance inference could be set up; None until tried
+    _MAX_CACHED = 3 # Maximum number of per-language PaddleOCR instances kept in memory
+
+    def __init__(self, lang: str = 'en', max_side: int = 1600):
         """
         Initializes the OCRProcessor. PaddleOCR will download models if not found.
         Args:
             lang (str): The language to use for OCR. Defaults to 'en'.
+            max_side (int): Longest image side used for text detection. Larger images are
+                downscaled for detection only; recognition still crops from the full-resolution image.
         """
         self.current_lang = lang
-        self._initialize_ocr_instance()
+        self.max_side = max_side
+        # LRU cache of loaded pipelines keyed by lang code, most recently used last
+        self._instances: "OrderedDict[str, PaddleOCR]" = OrderedDict()
+        self._get_instance(self.current_lang)
+
+    @classmethod
+    def _gpu_available(cls) -> bool:
+        """Probes once whether Paddle was built with CUDA and caches the answer."""
+        if cls._use_gpu is None:
+            try:
+                import paddle
+                cls._use_gpu = bool(paddle.device.is_compiled_with_cuda())
+            except Exception:
+                cls._use_gpu = False
+        return cls._use_gpu
 
-    def _initialize_ocr_instance(self):
-        self.ocr_instance = PaddleOCR(
-            lang=self.current_lang,
+    def _initialize_ocr_instance(self, lang: str) -> PaddleOCR:
+        base_kwargs = dict(
+            lang=lang,
             use_textline_orientation=False,
             use_doc_orientation_classify=False,
-            use_doc_unwarping=False
+            use_doc_unwarping=False,
+            # Downscale large screenshots for detection; boxes are mapped back to the original
+            text_det_limit_type="max",
+            text_det_limit_side_len=self.max_side
         )
-        print(f"OCR_UTILS: PaddleOCR instance initialized for lang='{self.current_lang}'.")
+        gpu = self._gpu_available()
+        if not gpu:
+            # Single screenshots gain nothing from batching on CPU, and a batch of 1
+            # keeps the recognition predictor from pre-allocating large arena chunks
+            base_kwargs["text_recognition_batch_size"] = 1
+        ocr_instance = None
+        # Skipped once HPI has failed this session, so later languages don't construct twice
+        if OCRProcessor._hpi_available is not False:
+            hpi_kwargs = dict(enable_hpi=True, cpu_threads=os.cpu_count() or 1)
+            if gpu:
+                # fp16 only takes effect through the TensorRT backend
+                hpi_kwargs.update(use_tensorrt=True, precision="fp16")
+            try:
+                # High-performance inference lets PaddleOCR pick OpenVINO / ONNX Runtime / TensorRT.
+                # Its plugins are not installed by default: `paddleocr install_hpi_deps cpu` (or `gpu`).
+                ocr_instance = PaddleOCR(**base_kwargs, **hpi_kwargs)
+                OCRProcessor._hpi_available = True
+            except Exception as e:
+                log.warning(
+                    "OCR_UTILS: High-performance inference unavailable (%s: %s), using default backend.",
+                    type(e).__name__, e
+                )
+        if ocr_instance is None:
+            # If this fails too, the error was not HPI-specific (e.g. a model download) and propagates
+            ocr_instance = PaddleOCR(**base_kwargs)
+            if OCRProcessor._hpi_available is None:
+                # The default backend works, so it was HPI itself that failed
+                OCRProcessor._hpi_available = False
+        log.debug("OCR_UTILS: PaddleOCR instance initialized for lang='%s'.", lang)
+        return ocr_instance
+
+    def _get_instance(self, lang: str) -> PaddleOCR:
+        """
+        Returns the PaddleOCR instance for the given language, loading it on first use.
+        Evicts the least recently used instance when more than _MAX_CACHED are loaded.
+        """
+        if lang in self._instances:
+            self._instances.move_to_end(lang)
+            return self._instances[lang]
+
+        ocr_instance = self._initialize_ocr_instance(lang)
+        self._instances[lang] = ocr_instance
+        while len(self._instances) > self._MAX_CACHED:
+            evicted_lang, evicted = self._instances.popitem(last=False)
+            del evicted # Drop the last reference so Paddle can free the model memory
+            log.debug("OCR_UTILS: Evicted cached PaddleOCR instance for lang='%s'.", evicted_lang)
+        return ocr_instance
 
     def set_language(self, lang: str):
         """
-        Sets a new language for OCR and re-initializes the PaddleOCR instance.
+        Sets a new language for OCR. The matching PaddleOCR instance is loaded
+        lazily on the next process_image call, or reused from the cache.
         """
         if lang != self.current_lang:
             self.current_lang = lang
-            self._initialize_ocr_instance() # Re-initialize with the new language
-            print(f"OCR_UTILS: OCR language changed to: {lang}")
+            log.debug("OCR_UTILS: OCR language changed to: %s", lang)
+
+    def warm_up(self):
+        """
+        Runs one dummy inference so graph building and backend setup happen now
+        rather than on the user's first scan.
+        """
+        # A blank image yields no boxes and would skip recognition, so draw some text to hit both models
+        image = np.full((640, 640, 3), 255, dtype=np.uint8)
+        cv2.putText(image, "Warm up 123", (40, 320), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+        self.process_image(image)
+        log.debug("OCR_UTILS: PaddleOCR warm-up finished for lang='%s'.", self.current_lang)
 
-    def process_image(self, image_path: str) -> Optional[str]:
+    def process_image(self, image: Union[str, np.ndarray]) -> Optional[str]:
         """
-        Performs OCR on the given image file.
+        Performs OCR on the given image file or in-memory image.
 
         Args:
-            image_path (str): Path to the image file.
+            image (Union[str, np.ndarray]): Path to the image file, or a BGR uint8 HxWx3 array.
 
         Returns:
             Optional[str]: Extracted text as a single string, or None if no text found or error.
         """
-        if not self.ocr_instance:
-            print("OCR_UTILS ERROR: OCR instance is not initialized.")
-            return None
-        if not os.path.exists(image_path):
-            print(f"Error: Image path does not exist: {image_path}")
+        if isinstance(image, str) and not os.path.exists(image):
+            log.error("OCR_UTILS: Image path does not exist: %s", image)
             return None
 
         try:
-            # predict() is expected to return List[paddlex.inference.pipelines.ocr.result.OCRResult]
-            # based on the log: "First element type: <class 'paddlex.inference.pipelines.ocr.result.OCRResult'>"
-            prediction_results = self.ocr_instance.predict(image_path)
-
-            if not prediction_results:
-                print("OCR (predict) returned no results (None or empty list).")
-                return None
-
-            all_extracted_texts: List[str] = []
-            
-            print(f"OCR_UTILS: Received {len(prediction_results)} result objects from predict().")
-            for i, res_obj in enumerate(prediction_results): # res_obj is a paddlex OCRResult
-                item_text = None
-                print(f"OCR_UTILS: Processing result object {i+1}, type: {type(res_obj)}")
-                try:
-                    if hasattr(res_obj, 'json') and isinstance(res_obj.json, dict):
-                        json_data = res_obj.json
-                        if 'res' in json_data and isinstance(json_data['res'], dict):
-                            res_content = json_data['res']
-                            if 'rec_texts' in res_content and isinstance(res_content['rec_texts'], list):
-                                meaningful_texts = [text for text in res_content['rec_texts'] if isinstance(text, str) and text.strip()]
-                                if meaningful_texts:
-                                    item_text = "\n".join(meaningful_texts)
-                                    print(f"OCR_UTILS: Extracted text from result {i+1} via .json['res']['rec_texts']")
-                            else:
-                                print(f"OCR_UTILS: 'rec_texts' not found or not a list in res_obj.json['res'] for item {i+1}")
-                        else:
-                            print(f"OCR_UTILS: 'res' not found or not a dict in res_obj.json for item {i+1}")
-                    else:
-                         print(f"OCR_UTILS: Result object {i+1} does not have .json attribute or it's not a dict.")
-                except Exception as e_json:
-                    print(f"OCR_UTILS: Error accessing .json structure for item {i+1}: {e_json}")
-
-                # Fallback or alternative: Check if the object itself is a list of lines (standard PaddleOCR output)
-                # This case should ideally not be hit if type is paddlex.OCRResult and run_ocr.py's method is correct for it.
-                if not item_text and isinstance(res_obj, list):
-                    print(f"OCR_UTILS: .json parsing failed or yielded no text for item {i+1}. Trying to parse as list of lines.")
-                    current_res_lines_texts: List[str] = []
-                    for line_info in res_obj: # res_obj is a list of line_info
-                         if isinstance(line_info, list) and len(line_info) == 2:
-                            text_component = line_info[1]
-                            if isinstance(text_component, tuple) and len(text_component) == 2:
-                                text = text_component[0]
-                                if isinstance(text, str) and text.strip():
-                                    current_res_lines_texts.append(text.strip())
-                    if current_res_lines_texts:
-                        item_text = "\n".join(current_res_lines_texts)
-                        print(f"OCR_UTILS: Extracted text from result {i+1} by parsing as list of lines.")
-                
-                if item_text:
-                    all_extracted_texts.append(item_text)
-                else:
-                    print(f"OCR_UTILS: No text extracted for result object {i+1}. Object details: {str(res_obj)[:200]}")
-
-            if all_extracted_texts:
-                return "\n---\n".join(all_extracted_texts)
-            else:
-                print("OCR (predict) processed the image but found no meaningful text segments using any parsing method.")
-                return None
-
+            # predict() returns List[paddlex.inference.pipelines.ocr.result.OCRResult] in PaddleOCR 3.x
+            prediction_results = self._get_instance(self.current_lang).predict(image)
+            texts = [
+                text
+                for res_obj in prediction_results
+                for text in res_obj.json["res"]["rec_texts"]
+                if text and text.strip()
+            ]
         except Exception as e:
-            print(f"Error during OCR processing (predict method): {e}")
+            log.error("OCR_UTILS: Error during OCR processing (predict method): %s", e)
             return None
 
+        log.debug("OCR_UTILS: Extracted %d text segments from %d result objects.", len(texts), len(prediction_results))
+        return "\n".join(texts) or None
+
 if __name__ == '__main__':
     current_script_dir = os.path.dirname(os.path.abspath(__file__))
     dummy_image_path = os.path.join(os.path.dirname(current_script_dir), 'screenshot.png') 
@@ -18,6 +18,7 @@ prediction_results = ocr.predict(image_path)
 if prediction_results:
     print("\nOCR Prediction Results:")
     all_extracted_texts = []
+    strip = str.strip # Hoisted out of the per-line filter below
     
     # Iterate through the list of OCRResult objects
     # (typically one item for a single image)
@@ -25,15 +26,14 @@ if prediction_results:
         # Text extraction
         item_text = None
         # Text is found within res_obj.json['res']['rec_texts']
-        if hasattr(res_obj, 'json') and isinstance(res_obj.json, dict):
-            json_data = res_obj.json
-            if 'res' in json_data and isinstance(json_data['res'], dict):
-                res_content = json_data['res']
-                if 'rec_texts' in res_content and isinstance(res_content['rec_texts'], list):
-                    # Filter out empty strings and join the meaningful recognized texts
-                    meaningful_texts = [text for text in res_content['rec_texts'] if isinstance(text, str) and text.strip()]
-                    if meaningful_texts:
-                        item_text = "\n".join(meaningful_texts)
+        try:
+            rec_texts = res_obj.json['res']['rec_texts']
+            # Filter out empty strings and join the meaningful recognized texts
+            meaningful_texts = [text for text in rec_texts if text and strip(text)]
+            if meaningful_texts:
+                item_text = "\n".join(meaningful_texts)
+        except (AttributeError, KeyError, TypeError):
+            pass # Unexpected result layout; reported below as "could not extract text"
         
         if item_text:
             all_extracted_texts.append(item_text)